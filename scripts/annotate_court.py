@@ -4,6 +4,7 @@ import json
 import os
 import argparse
 import glob
+import time
 from pathlib import Path
 
 def annotate_court(video_path, output_path, annotator="spencer"):
@@ -29,6 +30,12 @@ def annotate_court(video_path, output_path, annotator="spencer"):
     
     cap.release()
     
+    # Annotate on a downscaled view (composing/showing full 1080p/4K frames is
+    # wasted bandwidth for clicking); points are stored in full-res coordinates
+    scale = min(1.0, 1280 / frame.shape[1])
+    if scale < 1.0:
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
     # Annotation state
     points = []
     current_point = 0
@@ -41,36 +48,48 @@ def annotate_court(video_path, output_path, annotator="spencer"):
         "Center line (right)"
     ]
     
+    # Set whenever the display needs re-composing (new point, reset)
+    dirty = True
+    
     def mouse_callback(event, x, y, flags, param):
-        nonlocal current_point, points
+        nonlocal current_point, points, dirty
         
         if event == cv2.EVENT_LBUTTONDOWN and current_point < 6:
+            x, y = int(round(x / scale)), int(round(y / scale))
             points.append([x, y])
             print(f"Point {current_point + 1}: {point_names[current_point]} at ({x}, {y})")
             current_point += 1
-            
-            # Redraw frame with all points
-            display_frame = frame.copy()
-            for i, (px, py) in enumerate(points):
-                color = (0, 255, 0) if i < 4 else (0, 0, 255)  # Green for corners, red for center
-                cv2.circle(display_frame, (px, py), 8, color, -1)
-                cv2.putText(display_frame, f"{i+1}", (px+10, py-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-            
-            cv2.imshow("Court Annotation", display_frame)
+            dirty = True
+    
+    def render():
+        """Compose the frame with the collected points and instruction text."""
+        display_frame = frame.copy()
+        
+        # Draw existing points
+        for i, (px, py) in enumerate(points):
+            px, py = int(round(px * scale)), int(round(py * scale))
+            color = (0, 255, 0) if i < 4 else (0, 0, 255)  # Green for corners, red for center
+            cv2.circle(display_frame, (px, py), 8, color, -1)
+            cv2.putText(display_frame, f"{i+1}", (px+10, py-10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        
+        if current_point < 6:
+            # Show current instruction
+            cv2.putText(display_frame, f"Click {point_names[current_point]} ({current_point+1}/6)", 
+                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            cv2.putText(display_frame, "Press 'r' to reset, 'q' to quit", (10, 70), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        else:
+            # All points collected
+            cv2.putText(display_frame, "All points collected! Press 's' to save, 'r' to reset", 
+                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+        
+        return display_frame
     
     # Create window and set mouse callback
     cv2.namedWindow("Court Annotation", cv2.WINDOW_NORMAL)
     cv2.setMouseCallback("Court Annotation", mouse_callback)
     
-    # Display instructions
-    display_frame = frame.copy()
-    cv2.putText(display_frame, f"Click {point_names[0]} (1/6)", (10, 30), 
-               cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-    cv2.putText(display_frame, "Press 'r' to reset, 'q' to quit", (10, 70), 
-               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    cv2.imshow("Court Annotation", display_frame)
-    
     print(f"Annotating court for: {video_path}")
     print("Instructions:")
     print("1. Click on the 4 court corners (in order: top-left, top-right, bottom-right, bottom-left)")
@@ -78,8 +97,17 @@ def annotate_court(video_path, output_path, annotator="spencer"):
     print("3. Press 'r' to reset, 'q' to quit")
     print()
     
+    # Event-driven loop: pollKey() returns immediately, and the display is only
+    # re-composed when the mouse callback or a reset marks it dirty
     while True:
-        key = cv2.waitKey(1) & 0xFF
+        if dirty:
+            cv2.imshow("Court Annotation", render())
+            dirty = False
+        
+        key = cv2.pollKey() & 0xFF
+        if key == 255:  # no key pressed
+            time.sleep(0.01)
+            continue
         
         if key == ord('q'):
             break
@@ -87,43 +115,10 @@ def annotate_court(video_path, output_path, annotator="spencer"):
             # Reset annotation
             points = []
             current_point = 0
-            cv2.imshow("Court Annotation", frame)
+            dirty = True
             print("Reset annotation")
-            continue
-        
-        # Update instruction text
-        if current_point < 6:
-            display_frame = frame.copy()
-            
-            # Draw existing points
-            for i, (px, py) in enumerate(points):
-                color = (0, 255, 0) if i < 4 else (0, 0, 255)
-                cv2.circle(display_frame, (px, py), 8, color, -1)
-                cv2.putText(display_frame, f"{i+1}", (px+10, py-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-            
-            # Show current instruction
-            cv2.putText(display_frame, f"Click {point_names[current_point]} ({current_point+1}/6)", 
-                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            cv2.putText(display_frame, "Press 'r' to reset, 'q' to quit", (10, 70), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            cv2.imshow("Court Annotation", display_frame)
-        else:
-            # All points collected
-            display_frame = frame.copy()
-            for i, (px, py) in enumerate(points):
-                color = (0, 255, 0) if i < 4 else (0, 0, 255)
-                cv2.circle(display_frame, (px, py), 8, color, -1)
-                cv2.putText(display_frame, f"{i+1}", (px+10, py-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-            
-            cv2.putText(display_frame, "All points collected! Press 's' to save, 'r' to reset", 
-                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-            cv2.imshow("Court Annotation", display_frame)
-            
-            if key == ord('s'):
-                break
+        elif key == ord('s') and current_point >= 6:
+            break
     
     cv2.destroyAllWindows()
     
@@ -170,22 +165,30 @@ def find_sessions_without_annotations():
     if not processed_dir.exists():
         return sessions_needing_annotation
     
-    # Find all player/session combinations
-    for player_dir in processed_dir.iterdir():
-        if not player_dir.is_dir():
-            continue
+    # Find all player/session combinations (scandir caches entry types, so no
+    # extra stat() per directory entry)
+    with os.scandir(processed_dir) as players:
+        player_dirs = sorted((e for e in players if e.is_dir()), key=lambda e: e.name)
+    
+    for player_dir in player_dirs:
+        with os.scandir(player_dir.path) as sessions:
+            session_dirs = sorted(
+                (e for e in sessions if e.is_dir() and e.name.startswith("session_")),
+                key=lambda e: e.name,
+            )
         
-        for session_dir in player_dir.iterdir():
-            if not session_dir.is_dir() or not session_dir.name.startswith("session_"):
-                continue
-            
+        for session_dir in session_dirs:
             # Check if this session has serve clips
-            serve_clips = list(session_dir.glob("serve_*.mp4"))
+            with os.scandir(session_dir.path) as clips:
+                serve_clips = sorted(
+                    Path(e.path) for e in clips
+                    if e.name.startswith("serve_") and e.name.endswith(".mp4")
+                )
             if not serve_clips:
                 continue
             
             # Check if annotation already exists
-            session_id = f"{session_dir.parent.name}_{session_dir.name}"
+            session_id = f"{player_dir.name}_{session_dir.name}"
             annotation_file = annotations_dir / f"{session_id}.json"
             
             if not annotation_file.exists():
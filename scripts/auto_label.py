@@ -1,18 +1,25 @@
+import json
+import multiprocessing
 import os
 import shutil
 import subprocess
 import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from ultralytics import YOLO
 
 # ===============================
 # CONFIGURATION
 # ===============================
 
 # YOLO model + dataset paths
-YOLO_MODEL = "models/best.pt"
+YOLO_MODEL = "models/best.pt"   # or an INT8 TensorRT export, e.g. models/best.engine
+YOLO_HALF = True                 # FP16 inference (ignored on CPU)
+YOLO_DEVICES = None              # e.g. [0, 1] to split serve folders across GPUs
 SERVE_DIR = "data/frames"
 YOLO_RUNS_DIR = "runs/detect"
 OUTPUT_DIR = "cvat_upload"
+YOLO_MANIFEST = os.path.join(YOLO_RUNS_DIR, ".manifest.json")  # skips unchanged serve folders
 
 # CVAT settings
 CVAT_ENABLED = True
@@ -26,6 +33,19 @@ CVAT_TASK_NAME = None       # auto-generated if None
 # ===============================
 
 
+def link_or_copy(src, dst):
+    """Hardlink src to dst, falling back to a real copy where links aren't supported."""
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        # replace the stale output; shutil.copy onto a link of the same file
+        # would raise SameFileError
+        os.remove(dst)
+        link_or_copy(src, dst)
+    except (OSError, NotImplementedError):
+        shutil.copy(src, dst)
+
+
 def ensure_dirs():
     """Create needed directories for YOLO outputs and merged dataset."""
     for d in [
@@ -37,36 +57,99 @@ def ensure_dirs():
         os.makedirs(d, exist_ok=True)
 
 
+def _file_signature(path):
+    st = os.stat(path)
+    return [st.st_mtime, st.st_size]
+
+
+def _folder_signature(path):
+    # A folder's own mtime only changes when entries are added or removed;
+    # frames re-extracted in place keep it, so look at the files themselves
+    with os.scandir(path) as it:
+        mtimes = [e.stat().st_mtime for e in it if e.is_file()]
+    return [max(mtimes, default=0.0), len(mtimes)]
+
+
+def load_yolo_manifest():
+    """Load {serve_folder: [newest_frame_mtime, frame_count, model_mtime, model_size]} for past YOLO runs."""
+    try:
+        with open(YOLO_MANIFEST, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_yolo_manifest(manifest):
+    with open(YOLO_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
 def run_yolo_on_serves():
     """Run YOLO prediction on all serve folders."""
-    serve_folders = sorted(
-        [
-            os.path.join(SERVE_DIR, d)
-            for d in os.listdir(SERVE_DIR)
-            if os.path.isdir(os.path.join(SERVE_DIR, d)) and "serve" in d
-        ]
-    )
+    with os.scandir(SERVE_DIR) as it:
+        serve_folders = sorted(
+            e.path for e in it
+            if e.is_dir() and "serve" in e.name
+        )
 
     if not serve_folders:
         print("No serve folders found in data/frames/")
         return []
 
-    print(f"Running YOLO on {len(serve_folders)} serve folders...")
-    for d in serve_folders:
+    # Skip folders whose frames and model haven't changed since the last run
+    manifest = load_yolo_manifest()
+    model_sig = _file_signature(YOLO_MODEL)
+    signatures = {d: _folder_signature(d) + model_sig for d in serve_folders}
+    todo = [
+        d for d in serve_folders
+        if manifest.get(d) != signatures[d]
+        or not os.path.isdir(os.path.join(YOLO_RUNS_DIR, os.path.basename(d), "labels"))
+    ]
+    if len(todo) < len(serve_folders):
+        print(f"Skipping {len(serve_folders) - len(todo)} serve folders with up-to-date predictions")
+    if not todo:
+        return serve_folders
+
+    print(f"Running YOLO on {len(todo)} serve folders...")
+    if YOLO_DEVICES and len(YOLO_DEVICES) > 1:
+        # One worker process per GPU, each with its own warm model. "spawn"
+        # keeps CUDA state out of forked children.
+        shards = [todo[i::len(YOLO_DEVICES)] for i in range(len(YOLO_DEVICES))]
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(YOLO_DEVICES), mp_context=ctx) as pool:
+            list(pool.map(predict_folders, shards, YOLO_DEVICES))
+    else:
+        predict_folders(todo, YOLO_DEVICES[0] if YOLO_DEVICES else None)
+
+    for d in todo:
+        manifest[d] = signatures[d]
+    save_yolo_manifest(manifest)
+    return serve_folders
+
+
+def predict_folders(folders, device=None):
+    """Run YOLO on each folder, loading the model once for all of them."""
+    # Load the model once and keep it warm across folders instead of paying
+    # model load + CUDA init per `yolo` CLI invocation
+    model = YOLO(YOLO_MODEL)
+    for d in folders:
         name = os.path.basename(d)
         print(f"  → {name}")
-        subprocess.run([
-            "yolo", "detect", "predict",
-            f"model={YOLO_MODEL}",
-            f"source={d}",
-            f"project={YOLO_RUNS_DIR}",
-            f"name={name}",
-            "imgsz=1920",
-            "save_txt=True",
-            "exist_ok=True",
-            "verbose=false"
-        ])
-    return serve_folders
+        results = model.predict(
+            source=d,
+            project=YOLO_RUNS_DIR,
+            name=name,
+            imgsz=1920,
+            half=YOLO_HALF,
+            device=device,
+            save_txt=True,
+            exist_ok=True,
+            verbose=False,
+            stream=True,
+        )
+        # stream=True returns a generator; drain it so every frame is processed
+        for _ in results:
+            pass
 
 
 def generate_task_name(serve_folders):
@@ -90,13 +173,14 @@ def generate_task_name(serve_folders):
 def collect_prediction_folders():
     """Find YOLO prediction folders that match serve names (not training runs)."""
     folders = []
-    for sub in os.listdir(YOLO_RUNS_DIR):
-        path = os.path.join(YOLO_RUNS_DIR, sub)
-        if not os.path.isdir(path):
-            continue
-        name = sub.lower()
-        if ("serve" in name or "session" in name) and not name.startswith(("train", "val")):
-            folders.append(path)
+    # scandir's DirEntry caches the type from the directory read (no stat per entry)
+    with os.scandir(YOLO_RUNS_DIR) as it:
+        for e in it:
+            if not e.is_dir():
+                continue
+            name = e.name.lower()
+            if ("serve" in name or "session" in name) and not name.startswith(("train", "val")):
+                folders.append(e.path)
     return sorted(folders)
 
 
@@ -115,22 +199,26 @@ def merge_predictions(folders):
             print(f"⚠️ Warning: No matching original serve folder found for {serve_name}")
             continue
 
-        serve_images = sorted([
-            f for f in os.listdir(serve_src_dir)
-            if f.lower().endswith((".jpg", ".png"))
-        ])
+        with os.scandir(serve_src_dir) as it:
+            serve_images = sorted(
+                e.name for e in it
+                if e.is_file() and e.name.lower().endswith((".jpg", ".png"))
+            )
+
+        # one directory read instead of an exists() check per frame
+        try:
+            with os.scandir(pred_labels_dir) as it:
+                label_set = {e.name for e in it if e.name.endswith(".txt")}
+        except FileNotFoundError:
+            label_set = set()
 
         for img_name in serve_images:
             base = f"frame_{i:06d}"
-            src_img = os.path.join(serve_src_dir, img_name)
-            src_txt = os.path.join(pred_labels_dir, os.path.splitext(img_name)[0] + ".txt")
-
-            dst_img = os.path.join(images_dir, f"{base}.jpg")
-            dst_txt = os.path.join(labels_dir, f"{base}.txt")
+            txt_name = img_name.rsplit(".", 1)[0] + ".txt"
 
-            shutil.copy(src_img, dst_img)
-            if os.path.exists(src_txt):
-                shutil.copy(src_txt, dst_txt)
+            link_or_copy(os.path.join(serve_src_dir, img_name), os.path.join(images_dir, f"{base}.jpg"))
+            if txt_name in label_set:
+                link_or_copy(os.path.join(pred_labels_dir, txt_name), os.path.join(labels_dir, f"{base}.txt"))
             i += 1
 
     print(f"Merged {i} clean frames from {len(folders)} serve folders.")
@@ -138,52 +226,33 @@ def merge_predictions(folders):
 
 def make_yolo_zip():
     """Create a CVAT-compatible YOLO 1.1 zip (labels only, with train.txt)."""
-    yolo_dir = os.path.join(OUTPUT_DIR, "yolo_manual")
-    obj_dir = os.path.join(yolo_dir, "obj_train_data")
     labels_dir = os.path.join(OUTPUT_DIR, "labels")
 
-    # rebuild structure
-    if os.path.exists(yolo_dir):
-        shutil.rmtree(yolo_dir)
-    os.makedirs(obj_dir, exist_ok=True)
-
-    label_files = [
+    label_files = sorted(
         f for f in os.listdir(labels_dir)
         if f.endswith(".txt")
-    ]
-
-    for f in label_files:
-        shutil.copy(os.path.join(labels_dir, f), os.path.join(obj_dir, f))
-
-    # write train.txt listing all label paths
-    train_txt_path = os.path.join(yolo_dir, "train.txt")
-    with open(train_txt_path, "w", encoding="utf-8") as f:
-        for f_name in label_files:
-            f.write(f"obj_train_data/{f_name}\n")
+    )
 
-    # write obj.data
-    with open(os.path.join(yolo_dir, "obj.data"), "w", encoding="utf-8") as f:
-        f.write("classes=1\n")
-        f.write("train=train.txt\n")
-        f.write("names=obj.names\n")
-        f.write("backup=backup/\n")
+    # read the many small label files in parallel to hide per-file open latency;
+    # the zip writer itself stays single-threaded
+    def read_label(f_name):
+        with open(os.path.join(labels_dir, f_name), "rb") as f:
+            return f_name, f.read()
 
-    # write obj.names
-    with open(os.path.join(yolo_dir, "obj.names"), "w", encoding="utf-8") as f:
-        f.write("Ball\n")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        entries = list(pool.map(read_label, label_files))
 
-    # zip up the dataset (correct root layout)
+    # write labels straight into the archive (no staging copy);
+    # text labels compress well even at level 1
     yolo_zip = os.path.abspath("serve_yolo_manual.zip").replace("\\", "/")
-    cwd = os.getcwd()
-    try:
-        os.chdir(yolo_dir)
-        with zipfile.ZipFile(yolo_zip, "w", zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk("."):
-                for file in files:
-                    full = os.path.join(root, file)
-                    zipf.write(full, full)
-    finally:
-        os.chdir(cwd)
+    with zipfile.ZipFile(yolo_zip, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
+        for f_name, data in entries:
+            zipf.writestr(f"obj_train_data/{f_name}", data)
+
+        # train.txt listing all label paths
+        zipf.writestr("train.txt", "".join(f"obj_train_data/{f_name}\n" for f_name in label_files))
+        zipf.writestr("obj.data", "classes=1\ntrain=train.txt\nnames=obj.names\nbackup=backup/\n")
+        zipf.writestr("obj.names", "Ball\n")
 
     print(f"Created YOLO 1.1 annotation package (labels only): {yolo_zip}")
     print(f" • {len(label_files)} label files listed in train.txt")
@@ -207,7 +276,8 @@ def upload_to_cvat(task_name):
     print(f"Uploading to CVAT task: {task_name}")
 
     images_zip = os.path.abspath("serve_images.zip").replace("\\", "/")
-    with zipfile.ZipFile(images_zip, "w", zipfile.ZIP_DEFLATED) as zipf:
+    # JPEGs are already entropy-coded; deflating them only burns CPU
+    with zipfile.ZipFile(images_zip, "w", zipfile.ZIP_STORED, allowZip64=True) as zipf:
         for root, _, files in os.walk(images_dir):
             for f in files:
                 full = os.path.join(root, f)
@@ -1,32 +1,97 @@
+#!/usr/bin/env python3
 import cv2
+import os
+import argparse
 import numpy as np
 
-# load image
-img = cv2.imread("court.jpg")
-gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+def detect_court_lines(frames):
+    """Run blur + Canny + HoughLinesP over frames, yielding (frame, edges, lines).
 
-# blur to reduce noise
-blur = cv2.GaussianBlur(gray, (5, 5), 1)
+    The gray/blur/edges buffers are allocated once and reused for every frame
+    of the same size, so `edges` is overwritten on the next iteration; copy it
+    if you need to keep it.
+    """
+    gray = blur = edges = None
+    for frame in frames:
+        h, w = frame.shape[:2]
+        if gray is None or gray.shape != (h, w):
+            gray = np.empty((h, w), np.uint8)
+            blur = np.empty_like(gray)
+            edges = np.empty_like(gray)
 
-# edge detection
-edges = cv2.Canny(blur, 50, 150, apertureSize=3)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
 
-# kernel = np.ones((3,3), np.uint8)
-# edges = cv2.dilate(edges, kernel, iterations=1)
+        # blur to reduce noise
+        cv2.GaussianBlur(gray, (5, 5), 1, dst=blur)
 
-# line detection
-lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=20, minLineLength=200, maxLineGap=30)
+        # edge detection
+        cv2.Canny(blur, 50, 150, edges=edges, apertureSize=3)
 
-# draw lines on copy
-out = img.copy()
-if lines is not None:
-    for line in lines:
-        x1, y1, x2, y2 = line[0]
-        cv2.line(out, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        # kernel = np.ones((3,3), np.uint8)
+        # edges = cv2.dilate(edges, kernel, iterations=1)
 
-# show
-cv2.imshow("edges", edges)
-cv2.waitKey(0)
-cv2.imshow("lines", out)
-cv2.waitKey(0)
-cv2.destroyAllWindows()
+        # line detection
+        lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=20, minLineLength=200, maxLineGap=30)
+
+        yield frame, edges, lines
+
+def draw_lines(img, lines):
+    """Return a copy of img with the detected line segments drawn in red."""
+    out = img.copy()
+    if lines is not None:
+        # one C call for all segments instead of a Python-level cv2.line() each
+        cv2.polylines(out, lines.reshape(-1, 2, 2), False, (0, 0, 255), 2)
+    return out
+
+def iter_frames(frames_dir):
+    """Yield frames extracted by extract_all_frames.py, in frame order."""
+    for name in sorted(os.listdir(frames_dir)):
+        if name.lower().endswith((".jpg", ".png")):
+            frame = cv2.imread(os.path.join(frames_dir, name))
+            if frame is not None:
+                yield frame
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect court lines with Canny + Hough")
+    parser.add_argument("--image", type=str, default="court.jpg",
+                        help="Single image to process and display (default: court.jpg)")
+    parser.add_argument("--frames", type=str, default=None,
+                        help="Folder of extracted frames to process in batch (e.g., data/frames/spencer_session_1_serve_001)")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Folder to save line overlays when using --frames")
+    args = parser.parse_args()
+
+    if args.frames:
+        if args.output:
+            os.makedirs(args.output, exist_ok=True)
+        count = 0
+        for i, (frame, _, lines) in enumerate(detect_court_lines(iter_frames(args.frames))):
+            n_lines = 0 if lines is None else len(lines)
+            if args.output:
+                cv2.imwrite(os.path.join(args.output, f"lines{i:06d}.jpg"), draw_lines(frame, lines))
+            count += 1
+            if count % 50 == 0:
+                print(f"  Processed {count} frames ({n_lines} lines in last frame)...")
+        print(f"Processed {count} frames from {args.frames}")
+        return
+
+    # load image
+    img = cv2.imread(args.image)
+    if img is None:
+        print(f"Could not read {args.image}")
+        return
+
+    _, edges, lines = next(detect_court_lines([img]))
+
+    # draw lines on copy
+    out = draw_lines(img, lines)
+
+    # show
+    cv2.imshow("edges", edges)
+    cv2.waitKey(0)
+    cv2.imshow("lines", out)
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,87 @@
 #!/usr/bin/env python3
 import cv2
+import numpy as np
 import os
 import argparse
+import json
 import tempfile
 import shutil
+import subprocess
 from pathlib import Path
 
+from frame_io import JpegWriterPool, open_video
+
+try:
+    # Optional NVDEC decoder when OpenCV lacks cudacodec (VPF / PyNvVideoCodec)
+    import PyNvCodec as nvc
+except ImportError:
+    nvc = None
+
+# Records what has already been extracted so unchanged videos are skipped
+MANIFEST_PATH = "data/frames/.manifest.json"
+
+# Intra-only codecs: every frame is a keyframe, so seeking is exact and cheap
+SEEK_CODECS = {"MJPG", "mjpg", "MJPEG"}
+# Long-GOP codecs: CAP_PROP_POS_FRAMES is inexact/expensive, decode sequentially
+GOP_CODECS = {"avc1", "h264", "H264", "hvc1", "hev1", "HEVC", "hevc"}
+
+def _fourcc(cap):
+    """Return the capture's codec as a 4-character string."""
+    code = int(cap.get(cv2.CAP_PROP_FOURCC))
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4))
+
+def _cudacodec_frames(video_path, every_n):
+    """Yield (frame_id, BGR frame) for sampled frames via cv2.cudacodec, or return None."""
+    if not hasattr(cv2, "cudacodec"):
+        return None
+    try:
+        if cv2.cuda.getCudaEnabledDeviceCount() == 0:
+            return None
+        reader = cv2.cudacodec.createVideoReader(video_path)
+    except cv2.error:
+        return None
+    
+    def frames():
+        frame_id = 0
+        while True:
+            ret, gpu_frame = reader.nextFrame()
+            if not ret:
+                break
+            if frame_id % every_n == 0:
+                yield frame_id, cv2.cuda.cvtColor(gpu_frame, cv2.COLOR_BGRA2BGR).download()
+            frame_id += 1
+    
+    return frames()
+
+def _vpf_frames(video_path, every_n, gpu_id=0):
+    """Yield (frame_id, BGR frame) for sampled frames via VPF's PyNvDecoder, or return None."""
+    if nvc is None:
+        return None
+    try:
+        decoder = nvc.PyNvDecoder(video_path, gpu_id)
+    except Exception:  # VPF raises plain RuntimeError/ValueError on unsupported input
+        return None
+    
+    w, h = decoder.Width(), decoder.Height()
+    to_bgr = nvc.PySurfaceConverter(w, h, nvc.PixelFormat.NV12, nvc.PixelFormat.BGR, gpu_id)
+    downloader = nvc.PySurfaceDownloader(w, h, nvc.PixelFormat.BGR, gpu_id)
+    cc_ctx = nvc.ColorspaceConversionContext(nvc.ColorSpace.BT_709, nvc.ColorRange.MPEG)
+    
+    def frames():
+        frame_id = 0
+        while True:
+            surface = decoder.DecodeSingleSurface()
+            if surface.Empty():
+                break
+            if frame_id % every_n == 0:
+                # NV12 -> BGR on the GPU, then download only this frame
+                frame = np.empty(h * w * 3, dtype=np.uint8)
+                if downloader.DownloadSingleSurface(to_bgr.Execute(surface, cc_ctx), frame):
+                    yield frame_id, frame.reshape(h, w, 3)
+            frame_id += 1
+    
+    return frames()
+
 def extract_all_frames(video_path, output_dir=None, every_n=1):
     """Extract frames from video to output directory."""
     
@@ -17,7 +93,7 @@ def extract_all_frames(video_path, output_dir=None, every_n=1):
         os.makedirs(output_dir, exist_ok=True)
         is_temp = False
     
-    cap = cv2.VideoCapture(video_path)
+    cap = open_video(video_path)
     if not cap.isOpened():
         print(f"Could not open {video_path}")
         return None
@@ -34,29 +110,176 @@ def extract_all_frames(video_path, output_dir=None, every_n=1):
     
     frame_id = 0
     saved = 0
+    # Joined once; the loops only format the frame number onto it
+    prefix = os.path.join(output_dir, "frame")
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # Save frame if it matches the sampling interval
-        if frame_id % every_n == 0:
-            out_path = os.path.join(output_dir, f"frame{frame_id:06d}.jpg")
-            cv2.imwrite(out_path, frame)
+    # Encode/write on worker threads so JPEG encoding of frame N overlaps the
+    # decode of frame N+1
+    writer = JpegWriterPool()
+    
+    # Seek straight to each sampled frame when the codec allows it; this skips
+    # whole GOPs instead of demuxing every packet
+    codec = _fourcc(cap)
+    use_seek = every_n > 1 and (
+        codec in SEEK_CODECS
+        or (fps > 0 and every_n >= fps and codec not in GOP_CODECS)
+    )
+    
+    # Otherwise prefer hardware (NVDEC) decode: cv2.cudacodec, then VPF
+    gpu_frames = None
+    if not use_seek:
+        gpu_frames = _cudacodec_frames(video_path, every_n) or _vpf_frames(video_path, every_n)
+    
+    if use_seek:
+        print(f"Seeking directly to sampled frames ({codec.strip() or 'unknown'} codec)")
+        # Keep seeking until a read fails: the frame count is only an estimate
+        # (0 or short for some MJPEG/MKV/MOV files), so it can't bound the loop
+        while True:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
+            ret, frame = cap.read(writer.buffer(height, width))
+            if not ret:
+                break
+            out_path = f"{prefix}{frame_id:06d}.jpg"
+            writer.submit(out_path, frame)
             saved += 1
-        
-        # Progress indicator
-        if frame_id % 100 == 0:
-            print(f"  Processed {frame_id}/{total_frames} frames...")
-        
-        frame_id += 1
+            
+            # Progress indicator
+            if saved % 50 == 0:
+                print(f"  Processed {frame_id}/{total_frames} frames...")
+            frame_id += every_n
+    elif gpu_frames is not None:
+        # Decoded on the GPU; only sampled frames reach host memory
+        print("Decoding on GPU (NVDEC)")
+        last_report = -100
+        for frame_id, frame in gpu_frames:
+            out_path = f"{prefix}{frame_id:06d}.jpg"
+            writer.submit(out_path, frame)
+            saved += 1
+            
+            # Progress indicator
+            if frame_id - last_report >= 100:
+                print(f"  Processed {frame_id}/{total_frames} frames...")
+                last_report = frame_id
+    else:
+        # Step from one sampled frame to the next: the skipped frames are only
+        # grab()bed (no BGR conversion or copy) in a tight loop with the bound
+        # methods hoisted, so they cost no per-frame Python bookkeeping. Sampled
+        # frames are decoded into the writer's preallocated buffer ring
+        grab, retrieve = cap.grab, cap.retrieve
+        skip = range(every_n - 1)
+        last_report = -100
+        while grab():
+            ret, frame = retrieve(writer.buffer(height, width))
+            if not ret:
+                break
+            out_path = f"{prefix}{frame_id:06d}.jpg"
+            writer.submit(out_path, frame)
+            saved += 1
+            
+            # Progress indicator
+            if frame_id - last_report >= 100:
+                print(f"  Processed {frame_id}/{total_frames} frames...")
+                last_report = frame_id
+            
+            for _ in skip:
+                if not grab():
+                    break
+            frame_id += every_n
     
     cap.release()
+    writer.close()
     print(f"Extracted {saved} frames from {video_path} → {output_dir}")
     
     return output_dir, is_temp
 
+def extract_with_ffmpeg(jobs, every_n=1):
+    """Extract frames from several videos with one ffmpeg process.
+    
+    Each (video_path, output_dir) job is a separate input mapped to its own
+    output folder, so process startup and hwaccel/codec setup are paid once
+    for the whole batch. Frames keep the frame{source_index:06d}.jpg naming.
+    
+    Returns one success flag per job. If ffmpeg fails, nothing it wrote is
+    moved into the output folders.
+    """
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    for video_path, _ in jobs:
+        cmd += ["-hwaccel", "auto", "-i", video_path]
+    
+    staging_dirs = []
+    for i, (_, output_dir) in enumerate(jobs):
+        os.makedirs(output_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".ffmpeg_", dir=output_dir)
+        staging_dirs.append(staging)
+        cmd += ["-map", f"{i}:v:0"]
+        if every_n > 1:
+            cmd += ["-vf", f"select=not(mod(n\\,{every_n}))"]
+        # Never duplicate or drop frames to force CFR (VFR phone footage), or
+        # output k would no longer be source frame k * every_n
+        cmd += ["-vsync", "vfr"]
+        cmd += ["-q:v", "2", "-start_number", "0", os.path.join(staging, "frame%06d.jpg")]
+    
+    print(f"Running ffmpeg on {len(jobs)} videos in one process...")
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        print("ffmpeg extraction failed:")
+        print(result.stderr.decode())
+        for staging in staging_dirs:
+            shutil.rmtree(staging, ignore_errors=True)
+        return [False] * len(jobs)
+    
+    # ffmpeg numbers output images 0,1,2,...; rename them to source frame ids
+    succeeded = []
+    for (video_path, output_dir), staging in zip(jobs, staging_dirs):
+        names = sorted(os.listdir(staging))
+        src_dir = staging + os.sep
+        prefix = os.path.join(output_dir, "frame")
+        for k, name in enumerate(names):
+            os.replace(src_dir + name, f"{prefix}{k * every_n:06d}.jpg")
+        os.rmdir(staging)
+        print(f"Extracted {len(names)} frames from {video_path} → {output_dir}")
+        succeeded.append(bool(names))
+    return succeeded
+
+def load_manifest(path=MANIFEST_PATH):
+    """Load the extraction manifest: {video_path: [mtime, size, every_n, output_dir, frame_count]}."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def _count_frames(output_dir):
+    if not os.path.isdir(output_dir):
+        return 0
+    with os.scandir(output_dir) as it:
+        return sum(1 for e in it if e.name.startswith("frame") and e.name.endswith(".jpg"))
+
+def _source_signature(video_path, every_n, output_dir):
+    """What an extraction depends on: the source file's mtime/size, --every, and the target folder."""
+    st = os.stat(video_path)
+    return [st.st_mtime, st.st_size, every_n, os.path.normpath(output_dir)]
+
+def is_up_to_date(manifest, video_path, output_dir, every_n):
+    """True if output_dir already holds frames extracted from this exact video and sampling."""
+    entry = manifest.get(os.path.normpath(video_path))
+    if not entry or entry[:4] != _source_signature(video_path, every_n, output_dir):
+        return False
+    # frames may have been cleared since (e.g. rm -rf data/frames/*)
+    return _count_frames(output_dir) == entry[4]
+
+def record_extraction(manifest, video_path, output_dir, every_n):
+    frame_count = _count_frames(output_dir)
+    if frame_count:  # never record a failed extraction as up to date
+        manifest[os.path.normpath(video_path)] = (
+            _source_signature(video_path, every_n, output_dir) + [frame_count]
+        )
+
 def find_serves_in_session(player, session):
     """Find all serve videos in a session directory."""
     session_dir = f"data/videos/processed/{player}/session_{session}"
@@ -87,6 +310,10 @@ def main():
                        help="List extracted frames and exit")
     parser.add_argument("--every", type=int, default=1,
                        help="Extract every nth frame (default: 1 = all frames)")
+    parser.add_argument("--force", action="store_true",
+                       help="Re-extract even if the manifest says frames are up to date")
+    parser.add_argument("--ffmpeg", action="store_true",
+                       help="Extract all videos with a single ffmpeg process (hardware decode when available)")
     
     args = parser.parse_args()
     
@@ -118,14 +345,13 @@ def main():
         print("Error: Either provide --video or --player and --session")
         return
     
-    # Process each video
+    # Resolve the output directory for each video
+    jobs = []
     for video_path in video_paths:
         if not os.path.exists(video_path):
             print(f"Video file not found: {video_path}")
             continue
         
-        print(f"\nProcessing: {video_path}")
-        
         # Determine output directory
         output_dir = args.output
         if output_dir is None:
@@ -145,13 +371,44 @@ def main():
                 print(f"Error: Could not determine output directory for: {video_path}")
                 continue
         
-        # Extract frames
-        result = extract_all_frames(video_path, output_dir, args.every)
-        if result is None:
-            continue
-        
-        output_dir, is_temp = result
-        
+        jobs.append((video_path, output_dir))
+    
+    # Skip videos whose frames are already extracted and unchanged
+    manifest = load_manifest()
+    skipped = []
+    if not args.force:
+        stale = []
+        for video_path, output_dir in jobs:
+            if is_up_to_date(manifest, video_path, output_dir, args.every):
+                print(f"Skipping {video_path} (frames up to date in {output_dir})")
+                skipped.append((video_path, output_dir))
+            else:
+                stale.append((video_path, output_dir))
+        jobs = stale
+    
+    if args.ffmpeg and jobs:
+        succeeded = extract_with_ffmpeg(jobs, args.every)
+        results = [job for job, ok in zip(jobs, succeeded) if ok]
+    else:
+        results = []
+        for video_path, output_dir in jobs:
+            print(f"\nProcessing: {video_path}")
+            
+            # Extract frames
+            result = extract_all_frames(video_path, output_dir, args.every)
+            if result is None:
+                continue
+            
+            output_dir, is_temp = result
+            results.append((video_path, output_dir))
+    
+    for video_path, output_dir in results:
+        record_extraction(manifest, video_path, output_dir, args.every)
+    if results:
+        save_manifest(manifest)
+    
+    # Up-to-date videos are still reported (and listed with --list)
+    for video_path, output_dir in skipped + results:
         if args.list:
             # List extracted frames
             frame_files = sorted(Path(output_dir).glob("frame*.jpg"))
@@ -5,6 +5,8 @@ import argparse
 import tempfile
 from pathlib import Path
 
+from frame_io import JpegWriterPool, open_video
+
 def extract_frame_range(video_path, start_frame, end_frame, output_dir=None):
     """Extract a range of frames from video to output directory."""
     
@@ -16,7 +18,7 @@ def extract_frame_range(video_path, start_frame, end_frame, output_dir=None):
         os.makedirs(output_dir, exist_ok=True)
         is_temp = False
     
-    cap = cv2.VideoCapture(video_path)
+    cap = open_video(video_path)
     if not cap.isOpened():
         print(f"Could not open {video_path}")
         return None
@@ -46,22 +48,26 @@ def extract_frame_range(video_path, start_frame, end_frame, output_dir=None):
     
     saved = 0
     current_frame = start_frame
-    
-    while current_frame <= end_frame:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # Save frame
-        out_path = os.path.join(output_dir, f"frame{current_frame:06d}.jpg")
-        cv2.imwrite(out_path, frame)
-        saved += 1
-        
-        # Progress indicator
-        if saved % 50 == 0:
-            print(f"  Extracted {saved}/{frame_count} frames...")
-        
-        current_frame += 1
+    prefix = os.path.join(output_dir, "frame")
+    
+    # Encode/write on worker threads while the next frame decodes; frames are
+    # decoded into the writer's preallocated buffer ring
+    with JpegWriterPool() as writer:
+        while current_frame <= end_frame:
+            ret, frame = cap.read(writer.buffer(height, width))
+            if not ret:
+                break
+            
+            # Save frame
+            out_path = f"{prefix}{current_frame:06d}.jpg"
+            writer.submit(out_path, frame)
+            saved += 1
+            
+            # Progress indicator
+            if saved % 50 == 0:
+                print(f"  Extracted {saved}/{frame_count} frames...")
+            
+            current_frame += 1
     
     cap.release()
     print(f"Extracted {saved} frames from {video_path} → {output_dir}")
@@ -1,13 +1,23 @@
 #!/usr/bin/env python3
 import cv2
+import numpy as np
 import os
 import argparse
+import multiprocessing
+
+from frame_io import open_video, write_jpeg
+
+# Sample gaps wider than this (in frames) are crossed by seeking, shorter ones
+# by grabbing forward
+SEEK_GAP = 30
+
+VIDEO_EXTS = {"mp4", "mov", "mkv"}
 
 def extract_frames(video_path, output_dir):
     """Extract ~30-40 evenly spaced frames per video based on fps and length."""
     os.makedirs(output_dir, exist_ok=True)
 
-    cap = cv2.VideoCapture(video_path)
+    cap = open_video(video_path)
     if not cap.isOpened():
         print(f"Could not open {video_path}")
         return
@@ -16,6 +26,8 @@ def extract_frames(video_path, output_dir):
     if not fps or fps <= 0:
         fps = 30.0
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     duration_s = total_frames / fps if fps > 0 else 0.0
 
     # Choose a target count based on duration (about 4 samples per second),
@@ -24,30 +36,38 @@ def extract_frames(video_path, output_dir):
     target_count = max(30, min(40, suggested if suggested > 0 else 30))
     target_count = min(target_count, total_frames) if total_frames > 0 else 0
 
-    # Evenly spaced frame indices to sample
-    sample_indices = set()
+    # Evenly spaced frame indices to sample (sorted, unique, all < total_frames)
+    sample_indices = []
     if total_frames > 0 and target_count > 0:
         step = total_frames / float(target_count)
-        for i in range(target_count):
-            idx = int(i * step)
-            if idx >= total_frames:
-                idx = total_frames - 1
-            sample_indices.add(idx)
+        idx = (np.arange(target_count) * step).astype(np.int64)
+        sample_indices = np.unique(np.minimum(idx, total_frames - 1)).tolist()
 
-    frame_id = 0
     saved = 0
-
-    while True:
-        ret, frame = cap.read()
+    pos = 0  # index of the frame the next read() returns
+    prefix = os.path.join(output_dir, "frame")
+    # Decode every sample into the same array; write_jpeg is synchronous
+    buf = np.empty((height, width, 3), np.uint8) if width > 0 and height > 0 else None
+
+    # Jump to each sampled frame instead of decoding the whole clip. Short gaps
+    # are stepped over with grab() (no BGR conversion/copy), since a seek has
+    # to re-decode from the previous keyframe anyway.
+    for idx in sample_indices:
+        if idx - pos > SEEK_GAP:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        else:
+            while pos < idx and cap.grab():
+                pos += 1
+            if pos < idx:
+                break
+        ret, frame = cap.read(buf)
         if not ret:
             break
+        pos = idx + 1
 
-        if frame_id in sample_indices:
-            out_path = os.path.join(output_dir, f"frame{frame_id:04d}.jpg")
-            cv2.imwrite(out_path, frame)
-            saved += 1
-
-        frame_id += 1
+        out_path = f"{prefix}{idx:04d}.jpg"
+        write_jpeg(out_path, frame)
+        saved += 1
 
     cap.release()
     print(f"Extracted {saved} frames from {video_path} → {output_dir}")
@@ -64,6 +84,10 @@ def main():
         help="Base folder for extracted frames"
     )
     # interval removed; frames are sampled evenly based on duration
+    parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="Videos to extract in parallel (default: number of CPU cores)"
+    )
     args = parser.parse_args()
 
     os.makedirs(args.output, exist_ok=True)
@@ -100,15 +124,29 @@ def main():
                 player_name = os.path.basename(parent)
             input_dir = args.input
 
-    for fname in sorted(os.listdir(input_dir)):
-        if not fname.lower().endswith((".mp4", ".mov", ".mkv")):
-            continue
-
-        video_path = os.path.join(input_dir, fname)
-        serve_id = os.path.splitext(fname)[0]
+    with os.scandir(input_dir) as it:
+        entries = sorted(
+            (e for e in it
+             if e.name.rpartition(".")[2].lower() in VIDEO_EXTS and e.is_file()),
+            key=lambda e: e.name,
+        )
+
+    jobs = []
+    for entry in entries:
+        video_path = entry.path
+        serve_id = os.path.splitext(entry.name)[0]
         serve_outdir = os.path.join(args.output, f"{player_name}_{session_id}_{serve_id}")
-
-        extract_frames(video_path, serve_outdir)
+        jobs.append((video_path, serve_outdir))
+
+    # Videos are independent, so decode them in parallel; each worker process
+    # opens its own VideoCapture
+    workers = min(len(jobs), args.jobs or os.cpu_count() or 1)
+    if workers <= 1:
+        for video_path, serve_outdir in jobs:
+            extract_frames(video_path, serve_outdir)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            pool.starmap(extract_frames, jobs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,244 @@
+# Shared video open / probe / frame write helpers for the scripts
+import os
+import stat
+import subprocess
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+try:
+    # Optional GPU JPEG encoder (pip install nvjpeg-python)
+    from nvjpeg import NvJpeg
+except ImportError:
+    NvJpeg = None
+
+try:
+    # Optional libjpeg-turbo SIMD encoder (pip install PyTurboJPEG)
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJFLAG_FASTDCT
+    _turbo = TurboJPEG()
+except (ImportError, OSError):  # OSError: package present but libturbojpeg missing
+    _turbo = None
+
+# Cheap JPEG encode settings
+JPEG_QUALITY = 90
+JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+
+# H.264 encoders in order of preference, with roughly crf-18-equivalent quality
+ENCODER_ARGS = {
+    "h264_nvenc": ["-preset", "p4", "-rc", "vbr", "-cq", "19"],
+    "h264_qsv": ["-preset", "veryfast", "-global_quality", "19"],
+    "h264_videotoolbox": ["-q:v", "60"],
+    "h264_amf": ["-quality", "quality", "-rc", "cqp", "-qp_i", "19", "-qp_p", "19"],
+    "libx264": ["-preset", "slow", "-crf", "18"],
+}
+
+# nvJPEG encoders are per-thread
+_nvjpeg_local = threading.local()
+
+def write_jpeg(out_path, frame):
+    """Encode a BGR frame to JPEG and write it, using the fastest encoder available.
+
+    Safe to call from worker threads: every encoder here releases the GIL.
+    """
+    if NvJpeg is not None:
+        # Encode on the GPU and write the compressed bitstream directly
+        encoder = getattr(_nvjpeg_local, "encoder", None)
+        if encoder is None:
+            encoder = _nvjpeg_local.encoder = NvJpeg()
+        buf = encoder.encode(frame, JPEG_QUALITY)
+    elif _turbo is not None:
+        buf = _turbo.encode(frame, quality=JPEG_QUALITY, pixel_format=TJPF_BGR, flags=TJFLAG_FASTDCT)
+    else:
+        cv2.imwrite(out_path, frame, JPEG_PARAMS)
+        return
+    _write_file(out_path, buf)
+
+def _write_file(path, data):
+    """Write bytes with raw os.write calls (no buffered file object in between)."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+class JpegWriterPool:
+    """Encode and write JPEGs on worker threads while the caller keeps decoding.
+
+    Throughput becomes max(decode, workers * encode) instead of their sum. At
+    most 2 * workers frames are in flight, so memory stays bounded.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or min(8, os.cpu_count() or 4)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._pending = deque()
+        self._buffers = []
+        self._next_buffer = 0
+
+    def buffer(self, height, width):
+        """Return a preallocated HxWx3 buffer to decode the next frame into.
+
+        The ring holds one more buffer than can be in flight, so the one handed
+        out is never still being read by a pending write. Returns None (let
+        OpenCV allocate) when the frame size isn't known.
+        """
+        if height <= 0 or width <= 0:
+            return None
+        if not self._buffers or self._buffers[0].shape != (height, width, 3):
+            self._buffers = [np.empty((height, width, 3), np.uint8)
+                             for _ in range(2 * self.workers + 1)]
+            self._next_buffer = 0
+        buf = self._buffers[self._next_buffer]
+        self._next_buffer = (self._next_buffer + 1) % len(self._buffers)
+        return buf
+
+    def submit(self, out_path, frame):
+        # The frame is written as-is, not copied: don't reuse it until the
+        # write is done (arrays from buffer() are safe to decode into)
+        self._pending.append(self._pool.submit(write_jpeg, out_path, frame))
+        if len(self._pending) > 2 * self.workers:
+            self._pending.popleft().result()
+
+    def close(self):
+        """Wait for all queued writes (re-raising any write error)."""
+        while self._pending:
+            self._pending.popleft().result()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_text_atomic(path, text):
+    """Replace path with text so readers see either the old or the new file.
+
+    Callers format everything in memory first; it is written to a temp file in
+    the same directory, fsynced, then os.replace()d over the target in one go,
+    so an interrupted write never leaves it truncated.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp = tempfile.NamedTemporaryFile("w", newline="", delete=False, dir=directory,
+                                      prefix=".tmp_", suffix=os.path.basename(path))
+    try:
+        with tmp:
+            tmp.write(text)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        # NamedTemporaryFile is created 0600; keep the target's mode instead
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp.name, mode)
+        os.replace(tmp.name, path)
+    except BaseException:
+        try:
+            os.remove(tmp.name)
+        except OSError:
+            pass
+        raise
+
+def open_video(video_path):
+    """Open a video, asking FFmpeg for hardware-accelerated decode when possible.
+
+    Falls back to a plain cv2.VideoCapture when no accelerator is available or
+    the accelerated capture can't actually produce frames.
+    """
+    if hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):  # OpenCV >= 4.5.2
+        # No CAP_PROP_HW_DEVICE: OpenCV refuses an explicit device with ANY
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+        ])
+        if cap.isOpened():
+            ok, _ = cap.read()
+            if ok:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                return cap
+        cap.release()
+    return cv2.VideoCapture(video_path)
+
+def ffprobe_fps(video_path):
+    """Frame rate of the first video stream via ffprobe (r_frame_rate), or None.
+
+    Lighter than opening a VideoCapture; used where OpenCV reports no fps.
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=r_frame_rate",
+        "-of", "csv=p=0",
+        video_path,
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except FileNotFoundError:
+        return None
+    num, _, den = result.stdout.strip().partition("/")
+    try:
+        fps = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return fps if fps > 0 else None
+
+def probe_keyframes(source_video):
+    """Return sorted keyframe times (seconds from the start of the file) via ffprobe."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags:format=start_time",
+        "-of", "csv",
+        source_video,
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except FileNotFoundError:
+        return []
+    if result.returncode != 0:
+        return []
+
+    start_time, keyframes = 0.0, []
+    for line in result.stdout.splitlines():
+        section, _, rest = line.partition(",")
+        value, _, flags = rest.partition(",")
+        try:
+            t = float(value)
+        except ValueError:
+            continue
+        if section == "format":
+            start_time = t
+        elif "K" in flags:
+            keyframes.append(t)
+    # ffmpeg's input -ss is relative to the file's start time, the earliest
+    # start over all streams (audio may begin before the first video frame)
+    return sorted(t - start_time for t in keyframes)
+
+def pick_encoder():
+    """Return the first hardware H.264 encoder that actually works here, else libx264."""
+    try:
+        listed = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True).stdout
+    except FileNotFoundError:
+        return "libx264"
+    for name in ENCODER_ARGS:
+        if name == "libx264" or f" {name} " not in listed:
+            continue
+        # Being compiled in doesn't mean the GPU/driver is there (or that this
+        # build takes our flags); try a tiny encode with the exact arguments
+        test = subprocess.run([
+            "ffmpeg", "-hide_banner", "-v", "error",
+            "-f", "lavfi", "-i", "nullsrc=s=256x256:d=0.1",
+            "-c:v", name, *ENCODER_ARGS[name], "-f", "null", "-",
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if test.returncode == 0:
+            return name
+    return "libx264"
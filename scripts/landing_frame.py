@@ -1,37 +1,107 @@
 #!/usr/bin/env python3
 import cv2
 import csv
+import io
 import os
+from collections import OrderedDict
+
+from frame_io import write_text_atomic
 
 SERVES_CSV = "data/metadata/serves.csv"
 
-def update_csv(clip_path, landing_frame):
-    rows = []
-    updated = False
+# Memory budget for decoded frames kept around for stepping (a 1080p frame
+# is ~6 MB, so ~40 frames; at 4K ~10)
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
+# Forward gaps up to this many frames are decoded through instead of seeking
+MAX_READ_AHEAD = 30
+
+# Labels between checkpoint writes of serves.csv
+SAVE_EVERY = 10
+
+def _csv_stamp():
+    try:
+        st = os.stat(SERVES_CSV)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def load_csv():
+    """Read serves.csv into (rows, fieldnames, stamp), adding the landing_frame column if missing."""
+    stamp = _csv_stamp()
     with open(SERVES_CSV, "r", newline="") as f:
         reader = csv.DictReader(f)
+        rows = list(reader)
         fieldnames = reader.fieldnames or []
-        if "landing_frame" not in fieldnames:
-            fieldnames = fieldnames + ["landing_frame"]
-        for row in reader:
-            if row.get("output_clip") == clip_path:
-                row["landing_frame"] = str(landing_frame)
-                updated = True
-            rows.append(row)
-    if updated:
-        with open(SERVES_CSV, "w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-        print(f"Saved landing_frame={landing_frame} for {clip_path}")
-    else:
-        print(f"No row found in serves.csv for {clip_path}")
+    if "landing_frame" not in fieldnames:
+        fieldnames = fieldnames + ["landing_frame"]
+    return rows, fieldnames, stamp
+
+def write_csv(rows, fieldnames, stamp, labels):
+    """Save this session's labels ({output_clip: landing_frame}); returns the saved (rows, fieldnames, stamp).
+
+    If serves.csv changed on disk since it was read (e.g. split_serves.py added
+    clips), it is re-read and only the labels are applied on top of it.
+    """
+    if _csv_stamp() != stamp:
+        rows, fieldnames, _ = load_csv()
+    for row in rows:
+        landing = labels.get(row["output_clip"])
+        if landing is not None:
+            row["landing_frame"] = landing
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+    write_text_atomic(SERVES_CSV, buf.getvalue())
+    return rows, fieldnames, _csv_stamp()
+
+class FrameCache:
+    """Random access to a clip's frames without re-seeking on every step.
+
+    Seeking in H.264 restarts decode at the previous keyframe, so each seek
+    can cost a whole GOP. Here forward steps decode sequentially, and the
+    last FRAME_CACHE_BYTES worth of frames are kept so stepping back is free. Only a
+    miss behind the decoder (or far ahead of it) seeks. On a backward miss
+    the decode restarts a little earlier, so the frames just before are
+    cached as well.
+    """
+
+    def __init__(self, cap, max_bytes=FRAME_CACHE_BYTES):
+        self.cap = cap
+        self.max_bytes = max_bytes
+        self.size = None  # frames that fit in max_bytes, set on the first decode
+        self.frames = OrderedDict()
+        self.next_pos = 0  # index the next cap.read() returns
+
+    def get(self, idx):
+        frame = self.frames.get(idx)
+        if frame is not None:
+            self.frames.move_to_end(idx)
+            return frame
+
+        if idx < self.next_pos or idx - self.next_pos > MAX_READ_AHEAD:
+            start = max(0, idx - (self.size or 0) // 2) if idx < self.next_pos else idx
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            self.next_pos = start
+
+        while self.next_pos <= idx:
+            ret, frame = self.cap.read()
+            if not ret:
+                return None
+            if self.size is None:
+                self.size = max(1, self.max_bytes // frame.nbytes)
+            self.frames[self.next_pos] = frame
+            self.frames.move_to_end(self.next_pos)
+            if len(self.frames) > self.size:
+                self.frames.popitem(last=False)
+            self.next_pos += 1
+        return frame
 
 def label_clip(clip_path):
     cap = cv2.VideoCapture(clip_path)
     if not cap.isOpened():
         print(f"Could not open {clip_path}")
-        return None
+        return None, False
 
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     fps = cap.get(cv2.CAP_PROP_FPS)
@@ -41,19 +111,24 @@ def label_clip(clip_path):
 
     auto_forward = False
     auto_backward = False
-    labeled = False
+    landing_frame = None
     quit_all = False
+    frames = FrameCache(cap)
+    last_shown = -1
 
     while True:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, current)
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        display = frame.copy()
-        cv2.putText(display, f"Frame {current}/{total_frames-1}", (10,30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,0), 2)
-        cv2.imshow("Landing Labeler", display)
+        # Only fetch and redraw when the frame changed; while idle the window
+        # keeps showing the last image and the loop just polls for keys
+        if current != last_shown:
+            frame = frames.get(current)
+            if frame is None:
+                break
+
+            display = frame.copy()
+            cv2.putText(display, f"Frame {current}/{total_frames-1}", (10,30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,0), 2)
+            cv2.imshow("Landing Labeler", display)
+            last_shown = current
 
         key = cv2.waitKey(30) & 0xFF
 
@@ -79,8 +154,7 @@ def label_clip(clip_path):
             auto_backward = False
 
         if key == ord("l"):
-            update_csv(clip_path, current)
-            labeled = True
+            landing_frame = current
             break
         elif key == ord("q"):
             quit_all = True
@@ -88,12 +162,13 @@ def label_clip(clip_path):
 
     cap.release()
     cv2.destroyAllWindows()
-    return labeled, quit_all
+    return landing_frame, quit_all
 
 def main():
-    with open(SERVES_CSV, newline="") as f:
-        reader = csv.DictReader(f)
-        clips = [(row["output_clip"], row.get("landing_frame", "") or "") for row in reader]
+    # The CSV stays in memory for the session; it's written every SAVE_EVERY
+    # labels and on exit instead of once per label
+    rows, fieldnames, stamp = load_csv()
+    clips = [(row["output_clip"], row.get("landing_frame", "") or "") for row in rows]
 
     # stats before labeling
     total = len(clips)
@@ -116,29 +191,40 @@ def main():
     print(f"  ℹ{already_labeled} already labeled, {remaining} remaining\n")
 
     labeled_this_run = 0
-
-    for clip, landing in clips[start_index:]:
-        if not os.path.exists(clip):
-            print(f"Skipping missing {clip}")
-            continue
-        if landing and landing.strip() != "":
-            print(f"Skipping {clip} (already labeled)")
-            continue
-        result, quit_all = label_clip(clip)
-        if quit_all:
-            break
-        if result:
-            labeled_this_run += 1
-
-    # reload csv for final stats
-    with open(SERVES_CSV, newline="") as f:
-        reader = csv.DictReader(f)
-        final_labeled = sum(1 for row in reader if row.get("landing_frame", "").strip() != "")
+    labels = {}
+    unsaved = 0
+
+    try:
+        for i in range(start_index, total):
+            clip, landing = clips[i]
+            if not os.path.exists(clip):
+                print(f"Skipping missing {clip}")
+                continue
+            if landing and landing.strip() != "":
+                print(f"Skipping {clip} (already labeled)")
+                continue
+            landing_frame, quit_all = label_clip(clip)
+            if landing_frame is not None:
+                labels[clip] = str(landing_frame)
+                print(f"Labeled landing_frame={landing_frame} for {clip}")
+                labeled_this_run += 1
+                unsaved += 1
+                if unsaved >= SAVE_EVERY:
+                    rows, fieldnames, stamp = write_csv(rows, fieldnames, stamp, labels)
+                    unsaved = 0
+            if quit_all:
+                break
+    finally:
+        if unsaved:
+            rows, fieldnames, stamp = write_csv(rows, fieldnames, stamp, labels)
+            print(f"Saved {SERVES_CSV}")
+
+    final_labeled = sum(1 for row in rows if (row.get("landing_frame") or "").strip() != "")
 
     print("\nLabeling session summary:")
     print(f"  Labeled this run: {labeled_this_run}")
-    print(f"  Total labeled:    {final_labeled}/{total}")
-    print(f"  Remaining:        {total - final_labeled}")
+    print(f"  Total labeled:    {final_labeled}/{len(rows)}")
+    print(f"  Remaining:        {len(rows) - final_labeled}")
 
 if __name__ == "__main__":
     main()
@@ -2,62 +2,162 @@
 import csv
 import subprocess
 import os
+import argparse
+import bisect
 import cv2
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from frame_io import ENCODER_ARGS, ffprobe_fps, pick_encoder, probe_keyframes
 
 SERVES_CSV = "data/metadata/serves.csv"
 
-def regenerate_serves():
+# Clips cut from the same source per ffmpeg invocation
+CLIPS_PER_BATCH = 8
+
+@lru_cache(maxsize=None)
+def probe_fps(source_video):
+    """Detect FPS from source video to match splitter behavior.
+
+    Cached per source: every clip cut from a source shares one probe. This
+    stays on OpenCV rather than ffprobe so frame->time conversion uses exactly
+    the FPS split_serves.py used, and an in-process open is cheaper than
+    spawning ffprobe anyway.
+    """
+    fps = None
+    try:
+        cap = cv2.VideoCapture(source_video)
+        if cap.isOpened():
+            fps = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+    except Exception:
+        fps = None
+
+    if not fps or fps <= 0:
+        fps = ffprobe_fps(source_video)
+    if not fps:
+        print(f"Warning: Could not get FPS for {source_video}, using default 30fps")
+        fps = 30.0
+    return fps
+
+def row_fps(row):
+    """Source FPS recorded by split_serves.py in serves.csv, or None for older rows."""
+    try:
+        fps = float(row.get("fps") or 0)
+    except ValueError:
+        return None
+    return fps if fps > 0 else None
+
+def on_keyframe(keyframes, t, fps):
+    """True if t is within half a frame of a keyframe."""
+    i = bisect.bisect_left(keyframes, t)
+    near = keyframes[max(0, i - 1):i + 1]
+    return any(abs(k - t) < 0.5 / fps for k in near)
+
+def build_batch_cmd(source_video, rows, fps, copy_clips=(), encoder="libx264", threads=None):
+    """One ffmpeg command cutting several clips from the same source.
+
+    Each clip is its own input with -ss/-to before -i (fast keyframe seek), so
+    process startup and codec init are paid once per batch rather than per clip.
+    Clips listed in copy_clips are stream-copied instead of re-encoded; threads
+    caps each re-encode's encoder threads when batches run in parallel.
+    """
+    cmd = ["ffmpeg", "-n"]                 # never overwrite existing clips
+    for row in rows:
+        # Convert frames to time for ffmpeg
+        start_time = int(row["start_frame"]) / fps
+        end_time = int(row["end_frame"]) / fps
+        if encoder != "libx264":
+            cmd += ["-hwaccel", "auto"]    # decode on the GPU too when possible
+        cmd += ["-ss", str(start_time), "-to", str(end_time), "-i", source_video]
+    for i, row in enumerate(rows):
+        cmd += ["-map", f"{i}:v:0", "-an"]  # no audio
+        if row["output_clip"] in copy_clips:
+            # Starts on a keyframe: remux the packets, no decode/encode
+            cmd += ["-c:v", "copy", "-avoid_negative_ts", "make_zero"]
+        else:
+            cmd += ["-c:v", encoder]      # reencode (clean split)
+            cmd += ENCODER_ARGS[encoder]
+            cmd += ["-r", str(fps)]       # maintain original frame rate
+            if threads:
+                cmd += ["-threads", str(threads)]
+        cmd.append(row["output_clip"])
+    return cmd
+
+def run_batch(batch, cmd):
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        for row in batch:
+            if not os.path.exists(row["output_clip"]):
+                print(f"Failed: {row['output_clip']}")
+        print(result.stderr.decode())
+
+def regenerate_serves(copy=False, encoder="libx264", jobs=None):
+    # Group rows by source so each source is probed and opened once per batch
+    groups = defaultdict(list)
     with open(SERVES_CSV, newline="") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            player = row["player"]
-            serve_id = row["serve_id"]
-            source_video = row["source_video"]
-            output_clip = row["output_clip"]
-            start_frame = int(row["start_frame"])
-            end_frame = int(row["end_frame"])
-
-            os.makedirs(os.path.dirname(output_clip), exist_ok=True)
-
-            print(f"▶Re-generating {player} serve {serve_id} → {output_clip}")
-
-            # Detect FPS from source video to match splitter behavior
-            fps = None
-            try:
-                cap = cv2.VideoCapture(source_video)
-                if cap.isOpened():
-                    fps = cap.get(cv2.CAP_PROP_FPS)
-                cap.release()
-            except Exception:
-                fps = None
-
-            # Convert frames to time for ffmpeg
-            if fps and fps > 0:
-                start_time = start_frame / fps
-                end_time = end_frame / fps
-            else:
-                print(f"Warning: Could not get FPS for {source_video}, using default 30fps")
-                fps = 30.0
-                start_time = start_frame / fps
-                end_time = end_frame / fps
-
-            cmd = [
-                "ffmpeg", "-n",                # overwrite if exists
-                "-ss", str(start_time),
-                "-to", str(end_time),
-                "-i", source_video,
-                "-an",                         # no audio
-                "-c:v", "libx264",             # reencode (clean split)
-                "-preset", "slow",
-                "-crf", "18",
-                "-r", str(fps),                # maintain original frame rate
-                output_clip,
-            ]
-
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            if result.returncode != 0:
-                print(f"Failed: {output_clip}")
-                print(result.stderr.decode())
+            if os.path.exists(row["output_clip"]):
+                # -n would make the whole batch fail, so skip existing clips up front
+                print(f"Skipping existing {row['output_clip']}")
+                continue
+            groups[row["source_video"]].append(row)
+
+    batches = []
+    for source_video, rows in groups.items():
+        rows.sort(key=lambda r: int(r["start_frame"]))
+        # Prefer the fps split_serves.py recorded; only older rows need a probe
+        fps = row_fps(rows[0]) or probe_fps(source_video)
+
+        # Stream copy is only frame-exact when the clip starts on a keyframe;
+        # otherwise it would pull in earlier frames and shift landing_frame
+        copy_clips = set()
+        if copy:
+            keyframes = probe_keyframes(source_video)
+            copy_clips = {
+                r["output_clip"] for r in rows
+                if keyframes and on_keyframe(keyframes, int(r["start_frame"]) / fps, fps)
+            }
+            print(f"{source_video}: stream-copying {len(copy_clips)}/{len(rows)} keyframe-aligned clips")
+
+        for b in range(0, len(rows), CLIPS_PER_BATCH):
+            batches.append((source_video, fps, copy_clips, rows[b:b + CLIPS_PER_BATCH]))
+    if not batches:
+        return
+
+    # Batches write distinct clips, so run several ffmpeg processes at once.
+    # Half the cores by default since each encode is multithreaded itself, and
+    # the cores are split between them to avoid oversubscription.
+    cpus = os.cpu_count() or 2
+    workers = max(1, min(len(batches), jobs or cpus // 2))
+    threads = max(1, cpus // workers) if workers > 1 else None
+
+    cmds = []
+    for source_video, fps, copy_clips, batch in batches:
+        for row in batch:
+            os.makedirs(os.path.dirname(row["output_clip"]), exist_ok=True)
+            print(f"▶Re-generating {row['player']} serve {row['serve_id']} → {row['output_clip']}")
+        cmds.append((batch, build_batch_cmd(source_video, batch, fps, copy_clips, encoder, threads)))
+
+    # Threads are enough here: each one just waits on its ffmpeg process
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda job: run_batch(*job), cmds))
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-generate serve clips from serves.csv")
+    parser.add_argument("--copy", action="store_true",
+                        help="Stream-copy clips that start on a keyframe instead of re-encoding them")
+    parser.add_argument("--encoder", choices=["auto"] + list(ENCODER_ARGS), default="auto",
+                        help="H.264 encoder for re-encoded clips (default: first working hardware encoder, else libx264)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="ffmpeg processes to run in parallel (default: half the CPU cores)")
+    args = parser.parse_args()
+
+    encoder = pick_encoder() if args.encoder == "auto" else args.encoder
+    print(f"Using encoder: {encoder}")
+    regenerate_serves(copy=args.copy, encoder=encoder, jobs=args.jobs)
 
 if __name__ == "__main__":
-    regenerate_serves()
+    main()
@@ -1,78 +1,221 @@
 #!/usr/bin/env python3
 import cv2
+import numpy as np
 import subprocess
 import os
+import sys
 import argparse
-import glob
-import re
 import time
 import csv
+import io
+import bisect
+import queue
+import threading
 from collections import deque
 
+from frame_io import ENCODER_ARGS, ffprobe_fps, pick_encoder, probe_keyframes, write_text_atomic
+
 SERVES_CSV = os.path.join("data", "metadata", "serves.csv")
+CSV_HEADER = ["player","serve_id","session_id","source_video","output_clip","start_frame","end_frame","landing_frame","fps","marked_start_frame"]
+
+# Clip file names are serve_NNN.mp4; the id slice is computed once here
+CLIP_PREFIX = "serve_"
+CLIP_SUFFIX = ".mp4"
+_ID_SLICE = slice(len(CLIP_PREFIX), -len(CLIP_SUFFIX))
+
+# serves.csv is rewritten once this many changes are pending (and at the end)
+CSV_FLUSH_ROWS = 8
+
+# Most clips cut by one ffmpeg process when encodes back up
+SEGMENTS_PER_PROC = 8
+
+# Batched copies spanning at most this many seconds of source share one input
+# (demuxing the stretch between them is cheaper than reopening the file)
+SINGLE_INPUT_SPAN_S = 60.0
+
+# Background encodes run at lower priority so playback stays smooth
+if os.name == "nt":
+    LOW_PRIORITY = {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+else:
+    # Reniced right after launch instead: a preexec_fn isn't safe to run in
+    # the forked child while the prefetch thread is alive
+    LOW_PRIORITY = {}
+
+def _clip_path(output_dir, clip_id):
+    return os.path.join(output_dir, f"{CLIP_PREFIX}{clip_id:03d}{CLIP_SUFFIX}")
 
 def _next_serve_id(output_dir):
     os.makedirs(output_dir, exist_ok=True)
-    existing = glob.glob(os.path.join(output_dir, "serve_*.mp4"))
-    max_id = 0
-    pattern = re.compile(r"serve_(\d{3})\.mp4$")
-    for path in existing:
-        base = os.path.basename(path)
-        m = pattern.match(base)
-        if m:
+    # One pass over serve_NNN.mp4 names, parsed by slicing (NNN may exceed 999)
+    with os.scandir(output_dir) as it:
+        return max((int(e.name[_ID_SLICE]) for e in it
+                    if e.name.startswith(CLIP_PREFIX) and e.name.endswith(CLIP_SUFFIX)
+                    and e.name[_ID_SLICE].isdigit()),
+                   default=0) + 1
+
+def _delete_clip(db, path):
+    """Delete a clip and its serves.csv row; False if it doesn't exist."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    db.remove(path)
+    return True
+
+class _ServesDB:
+    """serves.csv held in memory for the session.
+
+    Rows are keyed by output_clip (insertion ordered, so the file keeps its
+    order); inserts and removes are O(1) and flush() rewrites the file once
+    CSV_FLUSH_ROWS changes are pending or at the end. If the file changed on
+    disk meanwhile (e.g. landing_frame.py saved labels), it is re-read and the
+    pending changes are applied on top instead of overwriting it.
+    """
+
+    def __init__(self, path=SERVES_CSV):
+        self.path = path
+        self._inserted = {}
+        self._removed = set()
+        self._load()
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self):
+        self.fieldnames = list(CSV_HEADER)
+        self.rows = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", newline="") as f:
+                reader = csv.DictReader(f)
+                if reader.fieldnames:
+                    self.fieldnames = reader.fieldnames + [c for c in CSV_HEADER if c not in reader.fieldnames]
+                for row in reader:
+                    self.rows[row["output_clip"]] = row
+        self.stamp = self._stamp()
+
+    def insert(self, row):
+        key = row["output_clip"]
+        self.rows.pop(key, None)
+        self.rows[key] = row
+        self._removed.discard(key)
+        self._inserted[key] = row
+
+    def remove(self, output_clip):
+        self.rows.pop(output_clip, None)
+        self._inserted.pop(output_clip, None)
+        self._removed.add(output_clip)
+
+    def flush(self, force=False):
+        pending = len(self._inserted) + len(self._removed)
+        if not pending or (not force and pending < CSV_FLUSH_ROWS):
+            return
+        if self._stamp() != self.stamp:
+            self._load()
+            for key in self._removed:
+                self.rows.pop(key, None)
+            for key, row in self._inserted.items():
+                self.rows.pop(key, None)
+                self.rows[key] = row
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=self.fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(self.rows.values())
+        write_text_atomic(self.path, buf.getvalue())
+        self.stamp = self._stamp()
+        self._inserted.clear()
+        self._removed.clear()
+
+class FramePrefetcher:
+    """Decode frames on a background thread, a few ahead of the display.
+
+    The thread owns the VideoCapture, so the UI never blocks on demux/decode.
+    next() returns (pos, frame), where pos is CAP_PROP_POS_FRAMES right after
+    that frame was read, or (None, None) at the end of the video. seek() drops
+    frames already decoded past the old position; set_skip() sets how many
+    frames are grab()bed without being retrieved between shown frames.
+    """
+
+    def __init__(self, cap, depth=4):
+        self.cap = cap
+        self.frames = queue.Queue(maxsize=depth)
+        self.control = queue.Queue()
+        self.generation = 0
+        # Frames are retrieved into a ring of arrays: depth queued + one held
+        # by the UI + one being decoded are never overwritten
+        self._buffers = [None] * (depth + 2)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        grab, retrieve = self.cap.grab, self.cap.retrieve
+        generation, skip, slot = 0, 0, 0
+        at_end = False
+        while True:
+            # Apply UI commands between frames; at EOF, wait for one
             try:
-                max_id = max(max_id, int(m.group(1)))
-            except ValueError:
+                cmd = self.control.get() if at_end else self.control.get_nowait()
+            except queue.Empty:
+                cmd = None
+            while cmd is not None:
+                kind, value = cmd
+                if kind == "stop":
+                    return
+                if kind == "seek":
+                    generation += 1
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, value)
+                    at_end = False
+                elif kind == "skip":
+                    skip = value
+                try:
+                    cmd = self.control.get_nowait()
+                except queue.Empty:
+                    cmd = None
+            if at_end:
                 continue
-    return max_id + 1
-
-def _delete_last_clip(output_dir, player):
-    existing = glob.glob(os.path.join(output_dir, "serve_*.mp4"))
-    if not existing:
-        return False, None, None
-    pattern = re.compile(r"serve_(\d{3})\.mp4$")
-    last_id = 0
-    last_path = None
-    for path in existing:
-        base = os.path.basename(path)
-        m = pattern.match(base)
-        if m:
-            try:
-                clip_id = int(m.group(1))
-            except ValueError:
+
+            for _ in range(skip):
+                if not grab():
+                    break
+            ret = grab()
+            if ret:
+                ret, self._buffers[slot] = retrieve(self._buffers[slot])
+            if not ret:
+                at_end = True
+                self.frames.put((generation, None, None))
                 continue
-            if clip_id > last_id:
-                last_id = clip_id
-                last_path = path
-    if last_path and os.path.exists(last_path):
-        os.remove(last_path)
-        _remove_from_csv(player, last_id, last_path)
-        return True, last_id, last_path
-    return False, None, None
-
-def _append_to_csv(player, serve_id, video_path, out_file, start_frame, end_frame, session_id):
-    os.makedirs(os.path.dirname(SERVES_CSV), exist_ok=True)
-    new_file = not os.path.exists(SERVES_CSV)
-    with open(SERVES_CSV, "a", newline="") as f:
-        writer = csv.writer(f)
-        if new_file:
-            writer.writerow(["player","serve_id","session_id","source_video","output_clip","start_frame","end_frame","landing_frame"])
-        writer.writerow([player, f"{serve_id:03d}", session_id, video_path, out_file, str(start_frame), str(end_frame), ""])
-
-def _remove_from_csv(player, serve_id, out_file):
-    if not os.path.exists(SERVES_CSV):
-        return
-    rows = []
-    with open(SERVES_CSV, "r", newline="") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if row and not (row[0] == player and row[1] == f"{serve_id:03d}" and row[4] == out_file):
-                rows.append(row)
-    with open(SERVES_CSV, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerows(rows)
-
-def split_serves(video_path, output_dir, player, session_id, max_jobs=None):
+            pos = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+            self.frames.put((generation, pos, self._buffers[slot]))
+            slot = (slot + 1) % len(self._buffers)
+
+    def next(self):
+        while True:
+            generation, pos, frame = self.frames.get()
+            if generation == self.generation:
+                return pos, frame
+            # Decoded before the last seek: drop it
+
+    def seek(self, pos):
+        self.generation += 1
+        self.control.put(("seek", pos))
+
+    def set_skip(self, skip):
+        self.control.put(("skip", skip))
+
+    def close(self):
+        self.control.put(("stop", None))
+        # Unblock a pending put() so the thread can see the stop
+        while self._thread.is_alive():
+            try:
+                self.frames.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        self._thread.join()
+
+def split_serves(video_path, output_dir, player, session_id, max_jobs=None, reencode=False):
     # Save serves under a player-specific subfolder inside output_dir
     session_str = f"session_{session_id}"
     output_dir = os.path.join(output_dir, player, session_str)
@@ -84,6 +227,10 @@ def split_serves(video_path, output_dir, player, session_id, max_jobs=None):
         return
 
     fps = cap.get(cv2.CAP_PROP_FPS)
+    if not fps or fps <= 0:
+        # Some containers don't expose a rate to OpenCV; ask ffprobe instead
+        fps = ffprobe_fps(video_path) or 30.0
+        print(f"OpenCV reported no fps; using {fps:.3f}")
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     duration = frame_count / fps
 
@@ -94,35 +241,67 @@ def split_serves(video_path, output_dir, player, session_id, max_jobs=None):
     cv2.namedWindow("split_serves", cv2.WINDOW_NORMAL)
     cv2.resizeWindow("split_serves", 1280, 720)  # Set reasonable default size
 
+    # Clips are stream-copied from a keyframe unless --reencode; keyframe times
+    # are listed once up front (demux only, no decode)
+    keyframes = [] if reencode else probe_keyframes(video_path)
+    if not reencode and not keyframes:
+        print("Could not list keyframes (is ffprobe installed?); re-encoding clips")
+    # Re-encodes use a hardware H.264 encoder when one works here
+    encoder = pick_encoder() if not keyframes else None
+    if encoder:
+        print(f"Re-encoding clips with {encoder}")
+
     serve_id = _next_serve_id(output_dir)
+    db = _ServesDB()
     start_frame = None
 
     fast_active = False
-    last_fast_key_time = 0.0
-
-    # Track background encoding jobs
-    active_jobs = []  # list of dicts: {proc, player, serve_id, video_path, out_file, start_frame, end_frame}
+    last_fast_key_ns = 0
+
+    # Track background encoding jobs. Each clip is a job dict
+    # {start_s, end_s, copy, input_args, output_args, player, serve_id, session_id,
+    #  video_path, out_file, start_frame, end_frame, marked_start_frame}
+    # waiting in pending_jobs until a slot frees up. A backlog is cut by one
+    # ffmpeg per free slot (up to SEGMENTS_PER_PROC clips each) instead of a
+    # process per clip; running holds {proc, jobs, launched_at}.
+    pending_jobs = deque()
+    running = []
+    max_running = max_jobs or max(1, (os.cpu_count() or 2) // 2)
 
     def _start_encode_job(start_frame, end_frame, out_path, current_fps):
+        marked_start_frame = start_frame
         # Convert frames to time for ffmpeg
         start_s = start_frame / current_fps
         end_s = end_frame / current_fps
-        
-        cmd = [
-            "ffmpeg", "-n",
-            "-ss", str(start_s),
-            "-to", str(end_s),
-            "-i", video_path,
-            "-an",
-            "-c:v", "libx264",
-            "-preset", "slow",
-            "-crf", "18",
-            "-r", str(current_fps),
-            out_path,
-        ]
-        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        active_jobs.append({
-            "proc": proc,
+
+        if keyframes:
+            # A stream copy has to start on a keyframe: move the start back to
+            # the one at or before the requested frame, and record that frame
+            # so serves.csv matches the clip's first frame (landing_frame is
+            # labeled relative to it)
+            i = bisect.bisect_right(keyframes, start_s + 0.5 / current_fps) - 1
+            start_s = keyframes[max(i, 0)]
+            snapped = int(round(start_s * current_fps))
+            if snapped != start_frame:
+                print(f"Serve {serve_id:03d} starts at keyframe {snapped} (marked {start_frame})")
+            start_frame = snapped
+            output_args = [
+                "-an",
+                "-c:v", "copy",
+                "-avoid_negative_ts", "make_zero",
+                "-movflags", "+faststart",
+            ]
+        else:
+            output_args = ["-an", "-c:v", encoder] + ENCODER_ARGS[encoder] + ["-r", str(current_fps)]
+        input_args = ["-ss", str(start_s), "-to", str(end_s)]
+        if encoder and encoder != "libx264":
+            input_args = ["-hwaccel", "auto"] + input_args  # decode on the GPU too
+        pending_jobs.append({
+            "start_s": start_s,
+            "end_s": end_s,
+            "copy": bool(keyframes),
+            "input_args": input_args,
+            "output_args": output_args,
             "player": player,
             "serve_id": serve_id,
             "session_id": session_id,
@@ -130,104 +309,236 @@ def split_serves(video_path, output_dir, player, session_id, max_jobs=None):
             "out_file": out_path,
             "start_frame": start_frame,
             "end_frame": end_frame,
-            "launched_at": time.time(),
+            "marked_start_frame": marked_start_frame,
         })
+        _pump_queue()
+
+    def _pump_queue():
+        # Launch queued clips while there are free slots, spreading a backlog
+        # evenly over them
+        while pending_jobs and len(running) < max_running:
+            free = max_running - len(running)
+            n = min(SEGMENTS_PER_PROC, -(-len(pending_jobs) // free))
+            jobs = [pending_jobs.popleft() for _ in range(n)]
+            cmd = ["ffmpeg", "-n"]
+            t0 = min(job["start_s"] for job in jobs)
+            if (len(jobs) > 1 and all(job["copy"] for job in jobs)
+                    and max(job["end_s"] for job in jobs) - t0 <= SINGLE_INPUT_SPAN_S):
+                # Close-together copies: open the source once at the earliest
+                # start and let each output select its range. A copied output
+                # begins at the first keyframe at/after its -ss, i.e. its
+                # snapped start (the 1 ms margin absorbs float rounding).
+                cmd += ["-ss", str(t0), "-i", video_path]
+                for job in jobs:
+                    cmd += ["-map", "0:v:0",
+                            "-ss", str(max(0.0, job["start_s"] - t0 - 0.001)),
+                            "-to", str(job["end_s"] - t0)]
+                    cmd += job["output_args"] + [job["out_file"]]
+            else:
+                # Spread-out cuts: one seeking input per clip, so nothing
+                # between them is read
+                for job in jobs:
+                    cmd += job["input_args"] + ["-i", job["video_path"]]
+                for i, job in enumerate(jobs):
+                    cmd += ["-map", f"{i}:v:0"] + job["output_args"] + [job["out_file"]]
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                    **LOW_PRIORITY)
+            if hasattr(os, "setpriority"):
+                try:
+                    os.setpriority(os.PRIO_PROCESS, proc.pid, 10)
+                except OSError:  # already exited
+                    pass
+            running.append({"proc": proc, "jobs": jobs, "launched_at": time.monotonic()})
+
+    def _cancel_job(out_path):
+        """Drop a queued or kill a running encode for out_path; True if there was one."""
+        for job in pending_jobs:
+            if job["out_file"] == out_path:
+                pending_jobs.remove(job)
+                return True
+        for batch in running:
+            if any(job["out_file"] == out_path for job in batch["jobs"]):
+                batch["proc"].kill()
+                batch["proc"].wait()
+                running.remove(batch)
+                # Requeue the other clips that ffmpeg was cutting; their partial
+                # files have to go or -n would refuse to write them again
+                for job in reversed(batch["jobs"]):
+                    if job["out_file"] != out_path:
+                        if os.path.exists(job["out_file"]):
+                            os.remove(job["out_file"])
+                        pending_jobs.appendleft(job)
+                _pump_queue()
+                return True
+        return False
+
+    # Completion messages are collected while harvesting and written together
+    # once per loop iteration (one write + flush instead of one per clip)
+    status_lines = []
+
+    def _flush_status():
+        if status_lines:
+            sys.stdout.write("".join(status_lines))
+            sys.stdout.flush()
+            status_lines.clear()
 
     def _harvest_finished_jobs():
+        if not running:
+            return
+        if hasattr(os, "waitid"):
+            # One syscall per frame instead of a poll() per job: peek whether
+            # any child has exited. WNOWAIT leaves it for its Popen to reap,
+            # so return codes stay intact.
+            try:
+                exited = os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOHANG | os.WNOWAIT)
+            except ChildProcessError:
+                exited = None
+            if exited is None:
+                return
         remaining = []
-        for job in active_jobs:
-            ret = job["proc"].poll()
+        for batch in running:
+            ret = batch["proc"].poll()
             if ret is None:
-                remaining.append(job)
+                remaining.append(batch)
                 continue
-            if ret == 0 and os.path.exists(job["out_file"]):
-                elapsed = time.time() - job.get("launched_at", time.time())
-                print(f"Encoding complete in {elapsed:.1f}s: {job['out_file']}")
-                _append_to_csv(job["player"], job["serve_id"], job["video_path"], job["out_file"], job["start_frame"], job["end_frame"], job["session_id"])
-            else:
-                print(f"Encoding failed for serve {job['serve_id']:03d}: {job['out_file']}")
-        active_jobs[:] = remaining
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        cv2.imshow("split_serves", frame)
-        base_delay_ms = max(1, int(1000.0 / fps)) if fps and fps > 0 else 30
-
-        # Determine playback pacing and poll keys in short intervals to avoid missing presses
-        now = time.time()
-        speed_multiplier = 4 if fast_active else 1
-        effective_delay_ms = max(1, int(base_delay_ms / speed_multiplier))
-        poll_chunk_ms = 1
-        remaining_ms = effective_delay_ms
-        key = -1
-        while remaining_ms > 0:
-            chunk = poll_chunk_ms if remaining_ms > poll_chunk_ms else remaining_ms
-            k = cv2.waitKey(chunk)
-            if k != -1:
-                key = k & 0xFF
+            elapsed = time.monotonic() - batch["launched_at"]
+            for job in batch["jobs"]:
+                if ret == 0 and os.path.exists(job["out_file"]):
+                    status_lines.append(f"Encoding complete in {elapsed:.1f}s: {job['out_file']}\n")
+                    db.insert({
+                        "player": job["player"],
+                        "serve_id": f"{job['serve_id']:03d}",
+                        "session_id": job["session_id"],
+                        "source_video": job["video_path"],
+                        "output_clip": job["out_file"],
+                        "start_frame": str(job["start_frame"]),
+                        "end_frame": str(job["end_frame"]),
+                        "landing_frame": "",
+                        "fps": repr(fps),  # source fps, so frame<->time needs no re-probe
+                        # start_frame is the clip's real first frame (a keyframe
+                        # when copied); this is the frame that was marked with 's'
+                        "marked_start_frame": str(job["marked_start_frame"]),
+                    })
+                else:
+                    status_lines.append(f"Encoding failed for serve {job['serve_id']:03d}: {job['out_file']}\n")
+        running[:] = remaining
+        _pump_queue()
+
+    base_delay_ms = max(1, int(1000.0 / fps))
+    # Preview is shown at most 1280 px wide (the window's size); resizing into a
+    # reused buffer first avoids pushing full-resolution frames through HighGUI
+    preview_scale = None
+    preview_buf = None
+    # Frames are decoded ahead on another thread; fast-forward skips happen
+    # there too, as grab()s without retrieve()
+    frames = FramePrefetcher(cap)
+    skip = 0
+
+    # Whatever ends the session (q, end of video, Ctrl+C, an error), the
+    # buffered rows for clips already on disk must reach serves.csv
+    try:
+        while True:
+            pos, frame = frames.next()
+            if frame is None:
                 break
-            remaining_ms -= chunk
 
-        now = time.time()
-        if key == ord('f'):
-            fast_active = True
-            last_fast_key_time = now
-        else:
-            if fast_active and (now - last_fast_key_time) > 0.2:
-                fast_active = False
-
-        if key == ord("s"):
-            start_frame = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
-            start_time = start_frame / fps
-            print(f"Serve {serve_id:03d} start at frame {start_frame} ({start_time:.2f}s)")
-
-        elif key == ord("e") and start_frame is not None:
-            end_frame = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
-            end_time = end_frame / fps
-            out_file = os.path.join(output_dir, f"serve_{serve_id:03d}.mp4")
-
-            _start_encode_job(start_frame, end_frame, out_file, fps)
-
-            serve_id += 1
-            start_frame = None
-
-        elif key == ord('d') and start_frame is None:
-            deleted, last_id, path = _delete_last_clip(output_dir, player)
-            if deleted:
-                serve_id = last_id
-                print(f"Deleted {path}")
-
-        elif key == ord("b"):
-            # Go back 30 frames
-            current_frame = cap.get(cv2.CAP_PROP_POS_FRAMES)
-            new_frame = max(0, current_frame - 30)
-            cap.set(cv2.CAP_PROP_POS_FRAMES, new_frame)
-            current_time = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
-
-        elif key == ord("q"):
-            break
-
-        # If we just ended a serve, skip fast-forward frame skipping this iteration
-        if fast_active and not (key == ord('e') and start_frame is None):
-            for _ in range(speed_multiplier - 1):
-                if not cap.grab():
+            if preview_scale is None:
+                h, w = frame.shape[:2]
+                preview_scale = min(1.0, 1280.0 / w)
+                if preview_scale < 1.0:
+                    preview_buf = np.empty((int(h * preview_scale), int(w * preview_scale), 3), np.uint8)
+            if preview_buf is not None:
+                cv2.resize(frame, preview_buf.shape[1::-1], dst=preview_buf, interpolation=cv2.INTER_AREA)
+                cv2.imshow("split_serves", preview_buf)
+            else:
+                cv2.imshow("split_serves", frame)
+
+            # Pace playback with one wait per frame; waitKey returns as soon as a
+            # key is pressed, so nothing is missed (1 ms polls cost ~15 ms each on
+            # Windows and burned CPU)
+            speed_multiplier = 4 if fast_active else 1
+            effective_delay_ms = max(1, int(base_delay_ms / speed_multiplier))
+            key = cv2.waitKey(effective_delay_ms)
+            key = key & 0xFF if key != -1 else -1
+
+            now_ns = time.monotonic_ns()
+            if key == ord('f'):
+                fast_active = True
+                last_fast_key_ns = now_ns
+            else:
+                if fast_active and (now_ns - last_fast_key_ns) > 200_000_000:  # 0.2 s
+                    fast_active = False
+
+            if key == ord("s"):
+                start_frame = pos
+                start_time = start_frame / fps
+                print(f"Serve {serve_id:03d} start at frame {start_frame} ({start_time:.2f}s)")
+
+            elif key == ord("e") and start_frame is not None:
+                end_frame = pos
+                end_time = end_frame / fps
+                out_file = _clip_path(output_dir, serve_id)
+
+                _start_encode_job(start_frame, end_frame, out_file, fps)
+
+                serve_id += 1
+                start_frame = None
+
+            elif key == ord('d') and start_frame is None:
+                # serve_id tracks the clips made so far, so the last one is normally
+                # serve_id - 1; step further back only past ids that never finished
+                for last_id in range(serve_id - 1, 0, -1):
+                    path = _clip_path(output_dir, last_id)
+                    if _cancel_job(path):
+                        # Not harvested yet, so there is no CSV row; drop the partial file
+                        if os.path.exists(path):
+                            os.remove(path)
+                        print(f"Cancelled {path}")
+                    elif _delete_clip(db, path):
+                        print(f"Deleted {path}")
+                    else:
+                        continue
+                    serve_id = last_id
                     break
 
-        # Check for completed encodes and pace playback
-        _harvest_finished_jobs()
-        # no extra sleep; we already waited via cv2.waitKey polling above
+            elif key == ord("b"):
+                # Go back 30 frames
+                frames.seek(max(0, pos - 30))
 
-    # Finalize: wait for remaining jobs
-    while True:
-        if not active_jobs:
-            break
-        _harvest_finished_jobs()
-        time.sleep(0.1)
+            elif key == ord("q"):
+                break
 
-    cap.release()
+            # Let the decoder know when fast-forward turns on or off
+            want_skip = 3 if fast_active else 0
+            if want_skip != skip:
+                skip = want_skip
+                frames.set_skip(skip)
+
+            # Check for completed encodes and pace playback
+            _harvest_finished_jobs()
+            _flush_status()
+            db.flush()
+            # no extra sleep; we already waited via cv2.waitKey polling above
+
+        # Finalize: block until the remaining encodes exit instead of polling
+        remaining_clips = sum(len(b["jobs"]) for b in running) + len(pending_jobs)
+        if remaining_clips:
+            print(f"Waiting for {remaining_clips} clip(s) to finish...")
+        while running:
+            if hasattr(os, "waitid"):
+                # Returns when any child exits; WNOWAIT leaves it for Popen to reap
+                try:
+                    os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOWAIT)
+                except ChildProcessError:
+                    running[0]["proc"].wait()
+            else:
+                running[0]["proc"].wait()
+            _harvest_finished_jobs()
+            _flush_status()
+    finally:
+        db.flush(force=True)
+        frames.close()
+        cap.release()
     cv2.destroyAllWindows()
 
 def main():
@@ -238,8 +549,11 @@ def main():
                         help="Folder to save processed serves")
     parser.add_argument("--player", type=str, required=True,
                         help="Player name for serves.csv")
+    parser.add_argument("--reencode", action="store_true",
+                        help="Re-encode clips (hardware H.264 if available, else libx264) so they start exactly on the marked frame "
+                             "(default: stream-copy from the keyframe at or before it)")
     parser.add_argument("--jobs", type=int, default=None,
-                        help="Max parallel encodes (optional)")
+                        help="Max parallel encodes; more are queued (default: half the CPU cores)")
     args = parser.parse_args()
 
     # Strictly require new raw path format for session detection.
@@ -260,7 +574,7 @@ def main():
         print("Error: Could not detect session from raw path. Expected data/videos/raw/YYYY-MM-DD/session_<num>/filename.mp4")
         return
 
-    split_serves(args.video, args.out, args.player, session_id, args.jobs)
+    split_serves(args.video, args.out, args.player, session_id, args.jobs, args.reencode)
 
 if __name__ == "__main__":
     main()